@@ -18,6 +18,7 @@ DEFAULT_ASSIGNMENT_SETTINGS: Dict[str, int] = {
     "highschool_full_threshold": 5,
     "middleschool_full_threshold": 4,
 }
+ASSIGNMENT_SETTING_FIELDS = tuple(DEFAULT_ASSIGNMENT_SETTINGS)
 
 
 def _as_int(value: Optional[str | int], fallback: int) -> int:
@@ -67,8 +68,14 @@ class AssignmentSettingsManager:
     def _save(self) -> None:
         if self._session_factory:
             with self._session_factory() as session:
+                records = {
+                    record.key: record
+                    for record in session.query(AssignmentSetting).filter(
+                        AssignmentSetting.key.in_(self._settings.keys())
+                    )
+                }
                 for key, value in self._settings.items():
-                    record = session.get(AssignmentSetting, key)
+                    record = records.get(key)
                     if record:
                         record.value = value
                     else:
@@ -5,9 +5,12 @@ import logging
 import os
 import re
 import tempfile
+from collections import defaultdict
 from datetime import date, datetime, timedelta
+from functools import lru_cache
 from typing import Any, Callable, Dict, Iterable, List, Optional, Set
 
+from sqlalchemy import insert
 from sqlalchemy.exc import IntegrityError
 
 from assignment_settings import AssignmentSettingsManager
@@ -25,6 +28,7 @@ NON_ASSIGNABLE_STATUSES = {"denied", "declined", "rejected", "cancelled", "withd
 CYCLE_HIGH = "HighSchool"
 CYCLE_MIDDLE = "MiddleSchool"
 CYCLE_GENERAL = "General"
+PRIORITY_CYCLES = frozenset({CYCLE_HIGH, CYCLE_MIDDLE})
 
 ALLOWED_EDIT_FIELDS = {
     "status",
@@ -42,6 +46,40 @@ ALLOWED_EDIT_FIELDS = {
 logger = logging.getLogger(__name__)
 
 
+def _minutes_from_match(match: tuple[str, str]) -> int:
+    hours, minutes = match
+    try:
+        return int(hours) * 60 + int(minutes)
+    except ValueError:
+        return 0
+
+
+@lru_cache(maxsize=512)
+def _parse_intervals(text: str) -> tuple[tuple[int, int], ...]:
+    intervals: list[tuple[int, int]] = []
+    for segment in text.split(","):
+        matches = _TIME_PATTERN.findall(segment)
+        if len(matches) >= 2:
+            start = _minutes_from_match(matches[0])
+            end = _minutes_from_match(matches[1])
+            if end > start:
+                intervals.append((start, end))
+    return tuple(intervals)
+
+
+@lru_cache(maxsize=64)
+def _cycles_for_label(label: str) -> frozenset[str]:
+    normalized = label.lower()
+    result: set[str] = set()
+    if "high" in normalized:
+        result.add(CYCLE_HIGH)
+    if "middle" in normalized:
+        result.add(CYCLE_MIDDLE)
+    if not result:
+        result.add(CYCLE_GENERAL)
+    return frozenset(result)
+
+
 class CoverAssignmentManager:
     def __init__(
         self,
@@ -68,11 +106,10 @@ class CoverAssignmentManager:
                 self._import_json_assignments()
                 with self._session_factory() as session:
                     records = session.query(CoverAssignment).all()
-            assignments: dict[str, list[dict[str, Any]]] = {}
+            assignments: defaultdict[str, list[dict[str, Any]]] = defaultdict(list)
             for record in records:
-                date_key = record.date.isoformat()
-                assignments.setdefault(date_key, []).append(self._assignment_from_record(record))
-            return assignments
+                assignments[record.date.isoformat()].append(self._assignment_from_record(record))
+            return dict(assignments)
         if not os.path.exists(self.storage_path):
             return {}
         try:
@@ -140,7 +177,11 @@ class CoverAssignmentManager:
         self._save_assignments()
         self.schedule_manager.rebuild_cover_assignments(self.assignments)
 
-    def assign_for_record(self, record: Dict[str, Any]) -> None:
+    def assign_for_record(
+        self,
+        record: Dict[str, Any],
+        absent_emails_by_date: Optional[dict[str, set[str]]] = None,
+    ) -> None:
         absent_email = record.get("teacher_email")
         if not absent_email:
             return
@@ -160,6 +201,7 @@ class CoverAssignmentManager:
         record_subject = str(record.get("subject") or "").strip()
         absent_email_normalized = absent_email.strip().lower()
         context_by_date: dict[str, dict[str, Any]] = {}
+        details_by_day: dict[str, list[dict[str, Any]]] = {}
         current = start_date
         while current <= end_date:
             weekday = current.weekday()
@@ -171,7 +213,7 @@ class CoverAssignmentManager:
                 current += timedelta(days=1)
                 continue
             date_key = current.isoformat()
-            details = self._details_for_teacher_on_day(absent_slug, day_code)
+            details = self._details_for_teacher_on_day(absent_slug, day_code, details_by_day)
             if not details:
                 logger.info(
                     "Skipping cover assignment for %s on %s (no schedule data)",
@@ -182,12 +224,10 @@ class CoverAssignmentManager:
                 continue
             is_friday = day_code == "Fr"
             hs_max_slots = 5 if is_friday else 7
-            absent_emails = {
-                str(entry.get("teacher_email") or "").strip().lower()
-                for entry in self.covers_manager.get_absences_for_date(date_key)
-            }
+            absent_emails = self._absent_emails_for_date(date_key, absent_emails_by_date)
             session_covers_log: dict[str, int] = {}
             context = context_by_date.setdefault(date_key, self._build_context(date_key))
+            stored: list[dict[str, Any]] = []
             for detail in details:
                 cover = self._select_cover_for_detail(
                     date_key,
@@ -212,15 +252,39 @@ class CoverAssignmentManager:
                 slug = cover["meta"].get("slug")
                 if slug:
                     session_covers_log[slug] = session_covers_log.get(slug, 0) + 1
-                self._store_assignment(date_key, record, detail, cover)
+                assignment = self._store_assignment(date_key, record, detail, cover)
+                if assignment:
+                    stored.append(assignment)
+            if stored:
+                try:
+                    self._insert_assignment_records(date_key, stored)
+                except Exception:
+                    self._discard_assignments(date_key, stored)
+                    raise
+                self._persist_assignments()
             current += timedelta(days=1)
 
+    def _absent_emails_for_date(
+        self,
+        date_key: str,
+        cache: Optional[dict[str, set[str]]] = None,
+    ) -> set[str]:
+        if cache is not None and date_key in cache:
+            return cache[date_key]
+        emails = {
+            str(entry.get("teacher_email") or "").strip().lower()
+            for entry in self.covers_manager.absent_teachers_for_date(date_key)
+        }
+        if cache is not None:
+            cache[date_key] = emails
+        return emails
+
     def _select_cover_for_detail(
         self,
         date_key: str,
         day_code: str,
         detail: dict[str, Any],
-        target_cycles: set[str],
+        target_cycles: frozenset[str],
         record_subject: str,
         absent_email: str,
         absent_emails: Set[str],
@@ -315,26 +379,10 @@ class CoverAssignmentManager:
         candidates.sort(key=lambda candidate: candidate["priority"])
         return candidates[0]
 
-    def _intervals_from_text(self, text: str | None) -> list[tuple[int, int]]:
+    def _intervals_from_text(self, text: str | None) -> tuple[tuple[int, int], ...]:
         if not text:
-            return []
-        intervals: list[tuple[int, int]] = []
-        for segment in text.split(","):
-            matches = _TIME_PATTERN.findall(segment)
-            if len(matches) >= 2:
-                start = self._minutes_from_match(matches[0])
-                end = self._minutes_from_match(matches[1])
-                if end > start:
-                    intervals.append((start, end))
-        return intervals
-
-    @staticmethod
-    def _minutes_from_match(match: tuple[str, str]) -> int:
-        hours, minutes = match
-        try:
-            return int(hours) * 60 + int(minutes)
-        except ValueError:
-            return 0
+            return ()
+        return _parse_intervals(text)
 
     def _intervals_from_day_summary(self, day_summary: dict[str, Any]) -> list[tuple[int, int]]:
         intervals: list[tuple[int, int]] = []
@@ -396,6 +444,7 @@ class CoverAssignmentManager:
             target_cycles = self._cycles_from_label(record.get("level_label"))
             record_subject = str(record.get("subject") or "").strip()
             absent_email_normalized = str(absent_email).strip().lower()
+            details_by_day: dict[str, list[dict[str, Any]]] = {}
             current = start_date
             while current <= end_date:
                 weekday = current.weekday()
@@ -407,7 +456,7 @@ class CoverAssignmentManager:
                     current += timedelta(days=1)
                     continue
                 date_key = current.isoformat()
-                details = self._details_for_teacher_on_day(absent_slug, day_code)
+                details = self._details_for_teacher_on_day(absent_slug, day_code, details_by_day)
                 if not details:
                     current += timedelta(days=1)
                     continue
@@ -497,16 +546,16 @@ class CoverAssignmentManager:
             return 3
         return 4
 
-    def _cycle_match(self, target_cycles: set[str], teacher_cycles: set[str]) -> bool:
-        target_priority = target_cycles & {CYCLE_HIGH, CYCLE_MIDDLE}
-        teacher_priority = teacher_cycles & {CYCLE_HIGH, CYCLE_MIDDLE}
+    def _cycle_match(self, target_cycles: frozenset[str], teacher_cycles: frozenset[str]) -> bool:
+        target_priority = target_cycles & PRIORITY_CYCLES
+        teacher_priority = teacher_cycles & PRIORITY_CYCLES
         return bool(target_priority & teacher_priority)
 
     def _max_covers_for_teacher(
         self,
         day_summary: dict[str, Any],
         day_code: str,
-        teacher_cycles: set[str],
+        teacher_cycles: frozenset[str],
     ) -> int:
         is_friday = day_code == "Fr"
         if CYCLE_HIGH in teacher_cycles:
@@ -536,15 +585,21 @@ class CoverAssignmentManager:
             max_covers = min(max_covers, 1)
         return max(1, max_covers)
 
-    def _details_for_teacher_on_day(self, slug: Optional[str], day_code: str) -> list[dict[str, Any]]:
+    def _details_for_teacher_on_day(
+        self,
+        slug: Optional[str],
+        day_code: str,
+        cache: Optional[dict[str, list[dict[str, Any]]]] = None,
+    ) -> list[dict[str, Any]]:
+        if cache is not None and day_code in cache:
+            return cache[day_code]
         if not slug:
             return []
         schedule = self.schedule_manager.get_schedule_for_teacher(slug)
         if not schedule:
             return []
+        details_by_day: dict[str, list[dict[str, Any]]] = {}
         for day in schedule["schedule"]:
-            if day.get("code") != day_code:
-                continue
             details: list[dict[str, Any]] = []
             for section in day.get("sections") or []:
                 period_label = section.get("period")
@@ -560,8 +615,10 @@ class CoverAssignmentManager:
                             "time": period_time,
                         }
                     )
-            return details
-        return []
+            details_by_day.setdefault(day.get("code"), details)
+        if cache is not None:
+            cache.update(details_by_day)
+        return details_by_day.get(day_code, [])
 
     def _normalize_subject(self, subject: Optional[str]) -> str:
         if not subject:
@@ -574,12 +631,12 @@ class CoverAssignmentManager:
         record: Dict[str, Any],
         detail: dict[str, Any],
         cover: dict[str, Any],
-    ) -> None:
+    ) -> Optional[dict[str, Any]]:
         class_subject = detail.get("subject") or record.get("subject") or "General"
         slot_key = self._slot_key_for_detail(detail)
         request_id = record.get("request_id")
         if self._assignment_exists(date_key, request_id, slot_key):
-            return
+            return None
         assignment = {
             "slot_key": slot_key,
             "request_id": request_id,
@@ -608,11 +665,16 @@ class CoverAssignmentManager:
             "cover_assigned_at": datetime.utcnow().isoformat(),
             "day_label": cover["day"]["label"],
         }
-        assignment_id = self._insert_assignment_record(date_key, assignment)
-        if assignment_id:
-            assignment["id"] = assignment_id
         self.assignments.setdefault(date_key, []).append(assignment)
-        self._persist_assignments()
+        return assignment
+
+    def _discard_assignments(self, date_key: str, assignments: list[dict[str, Any]]) -> None:
+        discarded = {id(assignment) for assignment in assignments}
+        kept = [row for row in self.assignments.get(date_key, []) if id(row) not in discarded]
+        if kept:
+            self.assignments[date_key] = kept
+        else:
+            self.assignments.pop(date_key, None)
 
     def _assignment_exists(
         self,
@@ -688,10 +750,7 @@ class CoverAssignmentManager:
         }
         is_friday = day_code == "Fr"
         hs_max_slots = 5 if is_friday else 7
-        absent_emails = {
-            str(record.get("teacher_email") or "").strip().lower()
-            for record in self.covers_manager.get_absences_for_date(date_key)
-        }
+        absent_emails = self._absent_emails_for_date(date_key)
         current_cover_slug = entry.get("cover_slug")
         exclude_slugs = {current_cover_slug} if current_cover_slug else set()
         context = self._build_context(date_key)
@@ -731,34 +790,7 @@ class CoverAssignmentManager:
         except ValueError:
             return None
         with self._session_factory() as session:
-            record = CoverAssignment(
-                date=assignment_date,
-                request_id=assignment.get("request_id"),
-                slot_key=assignment.get("slot_key") or "",
-                absent_teacher=assignment.get("absent_teacher") or "",
-                absent_email=assignment.get("absent_email") or "",
-                cover_teacher=assignment.get("cover_teacher") or "",
-                cover_email=assignment.get("cover_email") or "",
-                cover_slug=assignment.get("cover_slug"),
-                subject=assignment.get("subject"),
-                class_subject=assignment.get("class_subject"),
-                class_grade=assignment.get("class_grade"),
-                class_details=assignment.get("class_details"),
-                period_label=assignment.get("period_label"),
-                period_raw=assignment.get("period_raw"),
-                class_time=assignment.get("class_time"),
-                cover_subject=assignment.get("cover_subject"),
-                status=assignment.get("status"),
-                leave_type=assignment.get("leave_type"),
-                leave_start=self._parse_date(assignment.get("leave_start")),
-                leave_end=self._parse_date(assignment.get("leave_end")),
-                submitted_at=self._parse_datetime(assignment.get("submitted_at")),
-                cover_free_periods=self._as_int(assignment.get("cover_free_periods")),
-                cover_scheduled=self._as_int(assignment.get("cover_scheduled")),
-                cover_max_periods=self._as_int(assignment.get("cover_max_periods")),
-                cover_assigned_at=self._parse_datetime(assignment.get("cover_assigned_at")),
-                day_label=assignment.get("day_label"),
-            )
+            record = self._build_assignment_record(assignment_date, assignment)
             try:
                 session.add(record)
                 session.commit()
@@ -768,6 +800,61 @@ class CoverAssignmentManager:
                 return None
             return record.id
 
+    def _insert_assignment_records(self, date_key: str, assignments: list[dict[str, Any]]) -> None:
+        if not self._session_factory:
+            return
+        try:
+            assignment_date = date.fromisoformat(date_key)
+        except ValueError:
+            return
+        records = [self._build_assignment_record(assignment_date, assignment) for assignment in assignments]
+        with self._session_factory() as session:
+            try:
+                session.add_all(records)
+                session.commit()
+            except IntegrityError:
+                # Retry row by row so one existing slot doesn't drop the rest of the batch.
+                session.rollback()
+                records = []
+        if not records:
+            for assignment in assignments:
+                assignment_id = self._insert_assignment_record(date_key, assignment)
+                if assignment_id:
+                    assignment["id"] = assignment_id
+            return
+        for assignment, record in zip(assignments, records):
+            assignment["id"] = record.id
+
+    def _build_assignment_record(self, assignment_date: date, assignment: dict[str, Any]) -> CoverAssignment:
+        return CoverAssignment(
+            date=assignment_date,
+            request_id=assignment.get("request_id"),
+            slot_key=assignment.get("slot_key") or "",
+            absent_teacher=assignment.get("absent_teacher") or "",
+            absent_email=assignment.get("absent_email") or "",
+            cover_teacher=assignment.get("cover_teacher") or "",
+            cover_email=assignment.get("cover_email") or "",
+            cover_slug=assignment.get("cover_slug"),
+            subject=assignment.get("subject"),
+            class_subject=assignment.get("class_subject"),
+            class_grade=assignment.get("class_grade"),
+            class_details=assignment.get("class_details"),
+            period_label=assignment.get("period_label"),
+            period_raw=assignment.get("period_raw"),
+            class_time=assignment.get("class_time"),
+            cover_subject=assignment.get("cover_subject"),
+            status=assignment.get("status"),
+            leave_type=assignment.get("leave_type"),
+            leave_start=self._parse_date(assignment.get("leave_start")),
+            leave_end=self._parse_date(assignment.get("leave_end")),
+            submitted_at=self._parse_datetime(assignment.get("submitted_at")),
+            cover_free_periods=self._as_int(assignment.get("cover_free_periods")),
+            cover_scheduled=self._as_int(assignment.get("cover_scheduled")),
+            cover_max_periods=self._as_int(assignment.get("cover_max_periods")),
+            cover_assigned_at=self._parse_datetime(assignment.get("cover_assigned_at")),
+            day_label=assignment.get("day_label"),
+        )
+
     def _update_assignment_record(self, assignment: dict[str, Any]) -> None:
         if not self._session_factory:
             return
@@ -866,39 +953,40 @@ class CoverAssignmentManager:
             for entry in entries:
                 if not isinstance(entry, dict):
                     continue
-                record = CoverAssignment(
-                    date=assignment_date,
-                    request_id=entry.get("request_id"),
-                    slot_key=entry.get("slot_key") or "",
-                    absent_teacher=entry.get("absent_teacher") or "",
-                    absent_email=entry.get("absent_email") or "",
-                    cover_teacher=entry.get("cover_teacher") or "",
-                    cover_email=entry.get("cover_email") or "",
-                    cover_slug=entry.get("cover_slug"),
-                    subject=entry.get("subject"),
-                    class_subject=entry.get("class_subject"),
-                    class_grade=entry.get("class_grade"),
-                    class_details=entry.get("class_details"),
-                    period_label=entry.get("period_label"),
-                    period_raw=entry.get("period_raw"),
-                    class_time=entry.get("class_time"),
-                    cover_subject=entry.get("cover_subject"),
-                    status=entry.get("status"),
-                    leave_type=entry.get("leave_type"),
-                    leave_start=self._parse_date(entry.get("leave_start")),
-                    leave_end=self._parse_date(entry.get("leave_end")),
-                    submitted_at=self._parse_datetime(entry.get("submitted_at")),
-                    cover_free_periods=self._as_int(entry.get("cover_free_periods")),
-                    cover_scheduled=self._as_int(entry.get("cover_scheduled")),
-                    cover_max_periods=self._as_int(entry.get("cover_max_periods")),
-                    cover_assigned_at=self._parse_datetime(entry.get("cover_assigned_at")),
-                    day_label=entry.get("day_label"),
+                records.append(
+                    {
+                        "date": assignment_date,
+                        "request_id": entry.get("request_id"),
+                        "slot_key": entry.get("slot_key") or "",
+                        "absent_teacher": entry.get("absent_teacher") or "",
+                        "absent_email": entry.get("absent_email") or "",
+                        "cover_teacher": entry.get("cover_teacher") or "",
+                        "cover_email": entry.get("cover_email") or "",
+                        "cover_slug": entry.get("cover_slug"),
+                        "subject": entry.get("subject"),
+                        "class_subject": entry.get("class_subject"),
+                        "class_grade": entry.get("class_grade"),
+                        "class_details": entry.get("class_details"),
+                        "period_label": entry.get("period_label"),
+                        "period_raw": entry.get("period_raw"),
+                        "class_time": entry.get("class_time"),
+                        "cover_subject": entry.get("cover_subject"),
+                        "status": entry.get("status"),
+                        "leave_type": entry.get("leave_type"),
+                        "leave_start": self._parse_date(entry.get("leave_start")),
+                        "leave_end": self._parse_date(entry.get("leave_end")),
+                        "submitted_at": self._parse_datetime(entry.get("submitted_at")),
+                        "cover_free_periods": self._as_int(entry.get("cover_free_periods")),
+                        "cover_scheduled": self._as_int(entry.get("cover_scheduled")),
+                        "cover_max_periods": self._as_int(entry.get("cover_max_periods")),
+                        "cover_assigned_at": self._parse_datetime(entry.get("cover_assigned_at")),
+                        "day_label": entry.get("day_label"),
+                    }
                 )
-                records.append(record)
         if not records:
             return
         with self._session_factory() as session:
-            session.bulk_save_objects(records)
+            session.execute(insert(CoverAssignment), records)
             session.commit()
 
     def _import_json_exclusions(self) -> None:
@@ -911,11 +999,11 @@ class CoverAssignmentManager:
             return
         if not isinstance(data, list):
             return
-        records = [ExcludedTeacher(slug=str(item).strip()) for item in data if item]
+        records = [{"slug": str(item).strip()} for item in data if item]
         if not records:
             return
         with self._session_factory() as session:
-            session.bulk_save_objects(records)
+            session.execute(insert(ExcludedTeacher), records)
             session.commit()
     def _covers_for_teacher_on_date(self, date_key: str, slug: str) -> int:
         return sum(
@@ -963,23 +1051,14 @@ class CoverAssignmentManager:
             except (TypeError, ValueError):
                 return 0
 
-    def _cycles_from_label(self, label: Optional[str]) -> set[str]:
-        if not label:
-            return {CYCLE_GENERAL}
-        normalized = label.lower()
-        result: set[str] = set()
-        if "high" in normalized:
-            result.add(CYCLE_HIGH)
-        if "middle" in normalized:
-            result.add(CYCLE_MIDDLE)
-        if not result:
-            result.add(CYCLE_GENERAL)
-        return result
+    def _cycles_from_label(self, label: Optional[str]) -> frozenset[str]:
+        return _cycles_for_label(label or "")
 
     def sync_existing_records(self) -> None:
+        absent_emails_by_date: dict[str, set[str]] = {}
         for records in self.covers_manager.get_all_records().values():
             for record in records:
-                self.assign_for_record(record)
+                self.assign_for_record(record, absent_emails_by_date)
 
     def get_assignments(self) -> dict[str, list[dict[str, Any]]]:
         return self.assignments.copy()
@@ -1069,6 +1148,7 @@ class CoverAssignmentManager:
 
     def assign_missing_records(self) -> int:
         pending_records = self.records_without_assignments()
+        absent_emails_by_date: dict[str, set[str]] = {}
         for record in pending_records:
-            self.assign_for_record(record)
+            self.assign_for_record(record, absent_emails_by_date)
         return len(pending_records)
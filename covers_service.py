@@ -3,13 +3,18 @@ from __future__ import annotations
 import json
 import logging
 import os
+import threading
 import urllib.error
 import urllib.request
-from datetime import date, datetime
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 from typing import Any, Callable, Dict, Optional
 
 from models import AbsenceRecord
-from sqlalchemy import and_
+from sqlalchemy import ColumnElement, and_, insert, or_, update
+from sqlalchemy.orm import defer
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 COVERS_FILE = os.path.join(BASE_DIR, "covers.json")
@@ -23,9 +28,30 @@ ABSENCES_REQUEST_SECRET_HEADER = os.getenv(
     "X-Absences-Request-Secret",
 )
 
+# 0 forwards inline; threads are not available on every WSGI host.
+COVERS_FORWARD_WORKERS = int(os.getenv("COVERS_FORWARD_WORKERS", "0"))
+
 logger = logging.getLogger(__name__)
 
 NON_ASSIGNABLE_STATUSES = {"denied", "declined", "rejected", "cancelled", "withdrawn"}
+LIST_QUERY_OPTIONS = (defer(AbsenceRecord.payload), defer(AbsenceRecord.forward_response))
+
+
+@lru_cache(maxsize=1024)
+def _parse_date_key(raw: str) -> Optional[str]:
+    try:
+        return date.fromisoformat(raw).isoformat()
+    except ValueError:
+        pass
+    for fmt in ("%Y-%m-%d", "%d-%m-%Y", "%m/%d/%Y"):
+        try:
+            return datetime.strptime(raw, fmt).date().isoformat()
+        except ValueError:
+            continue
+    try:
+        return datetime.fromisoformat(raw).date().isoformat()
+    except ValueError:
+        return None
 
 
 class CoversManager:
@@ -36,6 +62,9 @@ class CoversManager:
     ):
         self.storage_path = storage_path or COVERS_FILE
         self._session_factory = session_factory
+        self._forward_executor: Optional[ThreadPoolExecutor] = None
+        self._forward_lock = threading.Lock()
+        self._forwards_in_flight: set[str] = set()
         self.records: dict[str, list[dict[str, Any]]] = (
             self._load_records() if not self._session_factory else {}
         )
@@ -108,51 +137,190 @@ class CoversManager:
 
     def _record_leave_db(self, payload: Dict[str, Any]) -> dict[str, Any]:
         normalized = self._normalize_payload(payload)
-        with self._session_factory() as session:
-            existing = (
-                session.query(AbsenceRecord)
-                .filter(AbsenceRecord.request_id == normalized["request_id"])
-                .one_or_none()
-            )
-            if existing:
-                normalized.setdefault(
-                    "forwarded_at",
-                    existing.forwarded_at.isoformat() if existing.forwarded_at else None,
+        forward_inline = COVERS_FORWARD_WORKERS <= 0
+        should_forward = False
+        try:
+            with self._session_factory() as session:
+                existing = (
+                    session.query(AbsenceRecord)
+                    .options(defer(AbsenceRecord.payload))
+                    .filter(AbsenceRecord.request_id == normalized["request_id"])
+                    .one_or_none()
                 )
-                normalized.setdefault("forward_status", existing.forward_status)
-                normalized.setdefault("forward_response", existing.forward_response)
-            if self._should_forward(normalized):
-                forward_result = self._forward_leave_entry(normalized)
+                if existing:
+                    normalized.setdefault(
+                        "forwarded_at",
+                        existing.forwarded_at.isoformat() if existing.forwarded_at else None,
+                    )
+                    normalized.setdefault("forward_status", existing.forward_status)
+                    normalized.setdefault("forward_response", existing.forward_response)
+                # Claim before forwarding so a duplicate of an in-flight forward
+                # leaves the row to the running forwarder.
+                should_forward = (
+                    self._should_forward(normalized)
+                    and normalized.get("forward_status") != "forwarding"
+                    and self._claim_forward(normalized["request_id"])
+                )
+                if should_forward and forward_inline:
+                    forward_result = self._forward_leave_entry(normalized)
+                    normalized["forwarded_at"] = forward_result["timestamp"]
+                    normalized["forward_status"] = forward_result["status"]
+                    normalized["forward_response"] = forward_result["detail"]
+                elif should_forward:
+                    normalized["forward_status"] = "queued"
+                else:
+                    normalized.setdefault("forward_status", "pending")
+                if not normalized.get("forwarded_at"):
+                    normalized.setdefault("forwarded_at", None)
+                record = existing or AbsenceRecord(request_id=normalized["request_id"])
+                record.teacher = normalized["teacher"]
+                record.teacher_email = normalized.get("teacher_email") or ""
+                record.teacher_slug = normalized.get("teacher_slug")
+                record.leave_type = normalized.get("leave_type")
+                record.leave_start = date.fromisoformat(normalized["leave_start"])
+                record.leave_end = date.fromisoformat(normalized["leave_end"])
+                record.status = normalized.get("status")
+                record.reason = normalized.get("reason")
+                record.submitted_at = self._parse_datetime(normalized.get("submitted_at"))
+                record.recorded_at = self._parse_datetime(normalized.get("recorded_at"))
+                record.subject = normalized.get("subject")
+                record.level_label = normalized.get("level_label")
+                record.payload = json.dumps(payload)
+                # Forward columns belong to the forwarder once a row exists; only
+                # a new row or a new forward claim writes them here.
+                if should_forward or not existing:
+                    record.forwarded_at = self._parse_datetime(normalized.get("forwarded_at"))
+                    record.forward_status = normalized.get("forward_status")
+                    record.forward_response = normalized.get("forward_response")
+                session.add(record)
+                session.commit()
+        except Exception:
+            if should_forward:
+                self._release_forward(normalized["request_id"])
+            raise
+        if should_forward and forward_inline:
+            self._release_forward(normalized["request_id"])
+        elif should_forward:
+            forward_result = self._queue_forward(normalized)
+            if forward_result:
                 normalized["forwarded_at"] = forward_result["timestamp"]
                 normalized["forward_status"] = forward_result["status"]
                 normalized["forward_response"] = forward_result["detail"]
-            else:
-                normalized.setdefault(
-                    "forward_status", existing.forward_status if existing else "pending"
-                )
-            if not normalized.get("forwarded_at"):
-                normalized.setdefault("forwarded_at", None)
-            record = existing or AbsenceRecord(request_id=normalized["request_id"])
-            record.teacher = normalized["teacher"]
-            record.teacher_email = normalized.get("teacher_email") or ""
-            record.teacher_slug = normalized.get("teacher_slug")
-            record.leave_type = normalized.get("leave_type")
-            record.leave_start = date.fromisoformat(normalized["leave_start"])
-            record.leave_end = date.fromisoformat(normalized["leave_end"])
-            record.status = normalized.get("status")
-            record.reason = normalized.get("reason")
-            record.submitted_at = self._parse_datetime(normalized.get("submitted_at"))
-            record.recorded_at = self._parse_datetime(normalized.get("recorded_at"))
-            record.subject = normalized.get("subject")
-            record.level_label = normalized.get("level_label")
-            record.payload = json.dumps(payload)
-            record.forwarded_at = self._parse_datetime(normalized.get("forwarded_at"))
-            record.forward_status = normalized.get("forward_status")
-            record.forward_response = normalized.get("forward_response")
-            session.add(record)
-            session.commit()
         return normalized
 
+    def _claim_forward(self, request_id: str) -> bool:
+        with self._forward_lock:
+            if request_id in self._forwards_in_flight:
+                return False
+            self._forwards_in_flight.add(request_id)
+            return True
+
+    def _release_forward(self, request_id: str) -> None:
+        with self._forward_lock:
+            self._forwards_in_flight.discard(request_id)
+
+    def _queue_forward(self, entry: dict[str, Any]) -> Optional[dict[str, Any]]:
+        try:
+            with self._forward_lock:
+                if self._forward_executor is None:
+                    self._forward_executor = ThreadPoolExecutor(
+                        max_workers=COVERS_FORWARD_WORKERS,
+                        thread_name_prefix="covers-forward",
+                    )
+            self._forward_executor.submit(
+                self._forward_and_store, dict(entry), AbsenceRecord.forward_status == "queued"
+            )
+        except Exception:
+            # Executor unavailable (e.g. interpreter shutdown); the inline
+            # forward still releases the claim when it finishes.
+            logger.exception("Failed to queue forward for %s; forwarding inline", entry.get("request_id"))
+            return self._forward_and_store(dict(entry), AbsenceRecord.forward_status == "queued")
+        return None
+
+    def _forward_and_store(
+        self,
+        entry: dict[str, Any],
+        claimable: ColumnElement[bool],
+    ) -> Optional[dict[str, Any]]:
+        try:
+            if not self._claim_forward_row(entry["request_id"], claimable):
+                return None
+            forward_result = self._forward_leave_entry(entry)
+            self._store_forward_result(entry, forward_result)
+            return forward_result
+        finally:
+            self._release_forward(entry["request_id"])
+
+    def _claim_forward_row(self, request_id: str, claimable: ColumnElement[bool]) -> bool:
+        # Compare-and-swap into 'forwarding'; the fresh forwarded_at keeps the
+        # row out of the stale criteria, so only one process wins it.
+        with self._session_factory() as session:
+            result = session.execute(
+                update(AbsenceRecord)
+                .where(AbsenceRecord.request_id == request_id, claimable)
+                .values(forward_status="forwarding", forwarded_at=datetime.utcnow())
+            )
+            session.commit()
+        return result.rowcount == 1
+
+    def _store_forward_result(self, entry: dict[str, Any], forward_result: dict[str, Any]) -> None:
+        try:
+            with self._session_factory() as session:
+                session.execute(
+                    update(AbsenceRecord)
+                    .where(
+                        AbsenceRecord.request_id == entry["request_id"],
+                        AbsenceRecord.forward_status == "forwarding",
+                    )
+                    .values(
+                        forwarded_at=self._parse_datetime(forward_result["timestamp"]),
+                        forward_status=forward_result["status"],
+                        forward_response=forward_result["detail"],
+                    )
+                )
+                session.commit()
+        except Exception:
+            logger.exception("Failed to store forward result for %s", entry.get("request_id"))
+
+    def forward_pending_records(self, min_age: timedelta = timedelta(minutes=10)) -> Counter[str]:
+        """Re-send approved leaves whose forward failed or never finished."""
+        outcomes: Counter[str] = Counter()
+        if not self._session_factory or not COVERS_FORWARD_URL:
+            return outcomes
+        retryable = self._forward_retry_criteria(datetime.utcnow() - min_age)
+        with self._session_factory() as session:
+            records = (
+                session.query(AbsenceRecord)
+                .options(*LIST_QUERY_OPTIONS)
+                .filter(retryable)
+                .order_by(AbsenceRecord.id)
+                .all()
+            )
+        for record in records:
+            entry = self._record_to_dict(record, include_payload=False)
+            if not self._should_forward(entry) or not self._claim_forward(entry["request_id"]):
+                continue
+            forward_result = self._forward_and_store(entry, retryable)
+            if forward_result:
+                outcomes[forward_result["status"]] += 1
+        return outcomes
+
+    @staticmethod
+    def _forward_retry_criteria(stale_before: datetime) -> ColumnElement[bool]:
+        # 'queued' and 'forwarding' rows older than stale_before lost their
+        # forwarder (worker died, process restarted) and can be taken over.
+        return or_(
+            AbsenceRecord.forward_status == "failed",
+            and_(
+                AbsenceRecord.forward_status == "queued",
+                or_(AbsenceRecord.recorded_at.is_(None), AbsenceRecord.recorded_at < stale_before),
+            ),
+            and_(
+                AbsenceRecord.forward_status == "forwarding",
+                or_(AbsenceRecord.forwarded_at.is_(None), AbsenceRecord.forwarded_at < stale_before),
+            ),
+        )
+
     def _import_json_records(self) -> None:
         if not os.path.exists(self.storage_path):
             return
@@ -181,30 +349,31 @@ class CoversManager:
                 parsed_end = self._parse_date(leave_end)
                 if not parsed_start or not parsed_end:
                     continue
-                record = AbsenceRecord(
-                    request_id=str(request_id),
-                    teacher=str(teacher),
-                    teacher_email=str(teacher_email),
-                    teacher_slug=entry.get("teacher_slug"),
-                    leave_type=entry.get("leave_type"),
-                    leave_start=parsed_start,
-                    leave_end=parsed_end,
-                    status=entry.get("status"),
-                    reason=entry.get("reason"),
-                    submitted_at=self._parse_datetime(entry.get("submitted_at")),
-                    recorded_at=self._parse_datetime(entry.get("recorded_at")),
-                    subject=entry.get("subject"),
-                    level_label=entry.get("level_label"),
-                    payload=json.dumps(entry.get("payload") or entry),
-                    forwarded_at=self._parse_datetime(entry.get("forwarded_at")),
-                    forward_status=entry.get("forward_status"),
-                    forward_response=entry.get("forward_response"),
+                records.append(
+                    {
+                        "request_id": str(request_id),
+                        "teacher": str(teacher),
+                        "teacher_email": str(teacher_email),
+                        "teacher_slug": entry.get("teacher_slug"),
+                        "leave_type": entry.get("leave_type"),
+                        "leave_start": parsed_start,
+                        "leave_end": parsed_end,
+                        "status": entry.get("status"),
+                        "reason": entry.get("reason"),
+                        "submitted_at": self._parse_datetime(entry.get("submitted_at")),
+                        "recorded_at": self._parse_datetime(entry.get("recorded_at")),
+                        "subject": entry.get("subject"),
+                        "level_label": entry.get("level_label"),
+                        "payload": json.dumps(entry.get("payload") or entry),
+                        "forwarded_at": self._parse_datetime(entry.get("forwarded_at")),
+                        "forward_status": entry.get("forward_status"),
+                        "forward_response": entry.get("forward_response"),
+                    }
                 )
-                records.append(record)
         if not records:
             return
         with self._session_factory() as session:
-            session.bulk_save_objects(records)
+            session.execute(insert(AbsenceRecord), records)
             session.commit()
 
     def _normalize_payload(self, payload: Dict[str, Any]) -> dict[str, Any]:
@@ -237,22 +406,22 @@ class CoversManager:
         if isinstance(raw_date, datetime):
             return raw_date.date().isoformat()
         if raw_date:
-            raw = str(raw_date).strip()
-            for fmt in ("%Y-%m-%d", "%d-%m-%Y", "%m/%d/%Y"):
-                try:
-                    return datetime.strptime(raw, fmt).date().isoformat()
-                except ValueError:
-                    continue
-            try:
-                return datetime.fromisoformat(raw).date().isoformat()
-            except ValueError:
-                pass
+            parsed = _parse_date_key(str(raw_date).strip())
+            if parsed:
+                return parsed
         return datetime.utcnow().date().isoformat()
 
     def get_absences_for_date(self, date_key: Optional[str] = None) -> list[dict[str, Any]]:
         normalized_date = self._normalize_date(date_key) if date_key else datetime.utcnow().date().isoformat()
         if self._session_factory:
-            return self._get_absences_for_date_db(normalized_date)
+            with self._session_factory() as session:
+                records = (
+                    session.query(AbsenceRecord)
+                    .options(*LIST_QUERY_OPTIONS)
+                    .filter(*self._active_on_date_criteria(normalized_date))
+                    .all()
+                )
+            return [self._record_to_dict(record, include_payload=False) for record in records]
         target_date = date.fromisoformat(normalized_date)
         result: list[dict[str, Any]] = []
         for entries in self.records.values():
@@ -261,24 +430,34 @@ class CoversManager:
                     result.append(entry)
         return result
 
-    def _get_absences_for_date_db(self, normalized_date: str) -> list[dict[str, Any]]:
+    def absent_teachers_for_date(self, date_key: Optional[str] = None) -> list[dict[str, Optional[str]]]:
+        normalized_date = self._normalize_date(date_key) if date_key else datetime.utcnow().date().isoformat()
+        if not self._session_factory:
+            return [
+                {"teacher_email": entry.get("teacher_email"), "teacher_slug": entry.get("teacher_slug")}
+                for entry in self.get_absences_for_date(normalized_date)
+            ]
+        with self._session_factory() as session:
+            rows = (
+                session.query(AbsenceRecord.teacher_email, AbsenceRecord.teacher_slug)
+                .filter(*self._active_on_date_criteria(normalized_date))
+                .all()
+            )
+        return [{"teacher_email": email, "teacher_slug": slug} for email, slug in rows]
+
+    @staticmethod
+    def _active_on_date_criteria(normalized_date: str) -> tuple:
         try:
             target_date = date.fromisoformat(normalized_date)
         except ValueError:
             target_date = datetime.utcnow().date()
-        with self._session_factory() as session:
-            records = (
-                session.query(AbsenceRecord)
-                .filter(
-                    and_(
-                        AbsenceRecord.leave_start <= target_date,
-                        AbsenceRecord.leave_end >= target_date,
-                    )
-                )
-                .filter(AbsenceRecord.status.notin_(NON_ASSIGNABLE_STATUSES))
-                .all()
-            )
-        return [self._record_to_dict(record) for record in records]
+        return (
+            and_(
+                AbsenceRecord.leave_start <= target_date,
+                AbsenceRecord.leave_end >= target_date,
+            ),
+            AbsenceRecord.status.notin_(NON_ASSIGNABLE_STATUSES),
+        )
 
     def _normalize_payload_dates(self, payload: Dict[str, Any]) -> tuple[str, str, str]:
         leave_start = self._normalize_date(payload.get("leave_start") or payload.get("leave_date"))
@@ -367,12 +546,34 @@ class CoversManager:
         if not self._session_factory:
             return self.records.copy()
         with self._session_factory() as session:
-            records = session.query(AbsenceRecord).all()
-        grouped: dict[str, list[dict[str, Any]]] = {}
+            records = session.query(AbsenceRecord).options(*LIST_QUERY_OPTIONS).all()
+        grouped: defaultdict[str, list[dict[str, Any]]] = defaultdict(list)
         for record in records:
-            key = record.leave_start.isoformat()
-            grouped.setdefault(key, []).append(self._record_to_dict(record))
-        return grouped
+            grouped[record.leave_start.isoformat()].append(self._record_to_dict(record, include_payload=False))
+        return dict(grouped)
+
+    def record_dates(self) -> list[str]:
+        if not self._session_factory:
+            return sorted(self.records)
+        with self._session_factory() as session:
+            rows = session.query(AbsenceRecord.leave_start).distinct().all()
+        return sorted(leave_start.isoformat() for (leave_start,) in rows if leave_start)
+
+    def get_records_for_start_date(self, date_key: str) -> list[dict[str, Any]]:
+        if not self._session_factory:
+            return list(self.records.get(date_key, []))
+        target_date = self._parse_date(date_key)
+        if not target_date:
+            return []
+        with self._session_factory() as session:
+            records = (
+                session.query(AbsenceRecord)
+                .options(*LIST_QUERY_OPTIONS)
+                .filter(AbsenceRecord.leave_start == target_date)
+                .order_by(AbsenceRecord.id)
+                .all()
+            )
+        return [self._record_to_dict(record, include_payload=False) for record in records]
 
     @staticmethod
     def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
@@ -393,8 +594,8 @@ class CoversManager:
             return None
 
     @staticmethod
-    def _record_to_dict(record: AbsenceRecord) -> dict[str, Any]:
-        return {
+    def _record_to_dict(record: AbsenceRecord, include_payload: bool = True) -> dict[str, Any]:
+        data = {
             "request_id": record.request_id,
             "teacher": record.teacher,
             "teacher_email": record.teacher_email,
@@ -408,11 +609,13 @@ class CoversManager:
             "recorded_at": record.recorded_at.isoformat() if record.recorded_at else None,
             "subject": record.subject,
             "level_label": record.level_label,
-            "payload": record.payload,
             "forwarded_at": record.forwarded_at.isoformat() if record.forwarded_at else None,
             "forward_status": record.forward_status,
-            "forward_response": record.forward_response,
         }
+        if include_payload:
+            data["payload"] = record.payload
+            data["forward_response"] = record.forward_response
+        return data
 
     def can_request_absences(self) -> bool:
         return bool(ABSENCES_REQUEST_URL)
@@ -2,14 +2,36 @@ from __future__ import annotations
 
 import os
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{os.path.join(BASE_DIR, 'saas.db')}")
-CONNECT_ARGS = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+CONNECT_ARGS = {"check_same_thread": False} if IS_SQLITE else {}
+# Server databases get an explicit pool; keep DB_POOL_SIZE * worker count
+# below the server's max_connections.
+POOL_OPTIONS = (
+    {}
+    if IS_SQLITE
+    else {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "20")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_pre_ping": True,
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "280")),
+    }
+)
 
-engine = create_engine(DATABASE_URL, future=True, connect_args=CONNECT_ARGS)
+# Single-column indexes superseded by composite ones, dropped on upgrade.
+OBSOLETE_INDEXES = {
+    "schedule_entries": ("ix_schedule_entries_teacher",),
+    "absence_records": ("ix_absence_records_leave_start",),
+    "duty_assignments": ("ix_duty_assignments_assignment_date",),
+    "pod_duty_assignments": ("ix_pod_duty_assignments_assignment_date",),
+}
+
+engine = create_engine(DATABASE_URL, future=True, connect_args=CONNECT_ARGS, **POOL_OPTIONS)
 SessionLocal = sessionmaker(bind=engine, expire_on_commit=False, autoflush=False)
 
 Base = declarative_base()
@@ -20,4 +42,23 @@ def get_session():
 
 
 def init_db() -> None:
-    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        Base.metadata.create_all(connection)
+        # create_all skips tables that already exist, so add any newer indexes.
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+        _drop_obsolete_indexes(connection)
+
+
+def _drop_obsolete_indexes(connection) -> None:
+    inspector = inspect(connection)
+    for table_name, index_names in OBSOLETE_INDEXES.items():
+        existing = {index["name"] for index in inspector.get_indexes(table_name)}
+        for index_name in index_names:
+            if index_name not in existing:
+                continue
+            if connection.dialect.name == "mysql":
+                connection.execute(text(f"DROP INDEX {index_name} ON {table_name}"))
+            else:
+                connection.execute(text(f"DROP INDEX {index_name}"))
@@ -2,19 +2,21 @@ from __future__ import annotations
 
 from collections import Counter
 from datetime import date, datetime, timedelta
+from functools import lru_cache
 import os
 import random
 import subprocess
 import uuid
 
-from flask import Flask, abort, jsonify, redirect, render_template, request, url_for
+import click
+from flask import Flask, abort, jsonify, redirect, render_template, request, stream_template, url_for
 from typing import Any
 
-from assignment_settings import AssignmentSettingsManager
+from assignment_settings import ASSIGNMENT_SETTING_FIELDS, AssignmentSettingsManager
 from cover_assignment import CoverAssignmentManager
 from covers_service import CoversManager
 from db import get_session, init_db
-from models import DutyAssignment
+from models import DutyAssignment, PodDutyAssignment
 from pod_duty import PodDutyManager
 from schedule_service import (
     DAY_LABELS,
@@ -34,11 +36,10 @@ DUTY_ASSIGNMENT_WEBHOOK_SECRET_HEADER = os.getenv(
 )
 DEPLOY_WEBHOOK_SECRET = os.getenv("DEPLOY_WEBHOOK_SECRET")
 DEPLOY_SCRIPT = os.path.join(BASE_DIR, "deploy.sh")
+POD_DUTY_PERIODS = tuple(period for period in ORDERED_PERIODS if period != "Homeroom")
+API_CACHE_MAX_AGE = int(os.getenv("API_CACHE_MAX_AGE", "10"))
 
 app = Flask(__name__)
-app.config["DUTY_ASSIGNMENT_WEBHOOK_URL"] = "https://behavioralreef.pythonanywhere.com/external/duty-assignments"
-app.config["DUTY_ASSIGNMENT_WEBHOOK_SECRET"] = "12345"
-app.config["DUTY_ASSIGNMENT_WEBHOOK_TIMEOUT"] = 5
 init_db()
 session_factory = get_session
 manager = ScheduleManager(DATA_FILE, session_factory=session_factory)
@@ -109,6 +110,25 @@ def _parse_date(value: str | None) -> date | None:
         return None
 
 
+@lru_cache(maxsize=1024)
+def _day_label_for_date_key(date_key: str) -> str | None:
+    try:
+        code = WEEKDAY_TO_DAY_CODE.get(datetime.fromisoformat(date_key).weekday())
+    except ValueError:
+        return None
+    if not code:
+        return None
+    return DAY_LABELS.get(code, code)
+
+
+def _conditional_json(payload: dict[str, Any]):
+    response = jsonify(payload)
+    response.add_etag()
+    response.cache_control.private = True
+    response.cache_control.max_age = API_CACHE_MAX_AGE
+    return response.make_conditional(request)
+
+
 def _normalize_duty_period(value: Any) -> str | None:
     if value is None:
         return None
@@ -376,10 +396,9 @@ def pod_duty_auto_assign_full_day():
             url_for("pod_duty_dashboard", status="failed", message="Invalid date.")
         )
 
-    periods = [period for period in ORDERED_PERIODS if period != "Homeroom"]
     total_suggested = 0
     errors: list[str] = []
-    for period in periods:
+    for period in POD_DUTY_PERIODS:
         current = pod_duty_manager.list_assignments(assignment_date, period)
         assigned_labels = set(current.keys())
         missing_pods = [
@@ -403,7 +422,7 @@ def pod_duty_auto_assign_full_day():
 
     status = "success" if not errors else "failed"
     summary_parts = [
-        f"Suggested {total_suggested} pod duties across {len(periods)} periods"
+        f"Suggested {total_suggested} pod duties across {len(POD_DUTY_PERIODS)} periods"
     ]
     if errors:
         displayed = errors[:4]
@@ -426,9 +445,8 @@ def pod_duty_auto_assign_full_day():
 def pod_duty_full_day():
     date_raw = request.args.get("date")
     assignment_date = _parse_date(date_raw) or date.today()
-    periods = [period for period in ORDERED_PERIODS if period != "Homeroom"]
     rows = []
-    for period in periods:
+    for period in POD_DUTY_PERIODS:
         assignments = pod_duty_manager.list_assignments(assignment_date, period)
         assignments_by_pod = []
         pods = []
@@ -559,7 +577,7 @@ def availability():
     if not day_code:
         return jsonify({"error": f"Could not parse day '{day_raw}'"}), 400
     result = manager.available_for_slot_api(day_code, period_label)
-    return jsonify(result)
+    return _conditional_json(result)
 
 
 @app.route("/api/check-availability")
@@ -603,7 +621,7 @@ def check_availability():
         slot_payload = manager.available_for_slot_api(normalized_day, period_label)
         day_code = normalized_day
         response_date = None
-    return jsonify(
+    return _conditional_json(
         {
             "date": response_date,
             "day": day_code,
@@ -708,7 +726,6 @@ def external_duty_assignments():
                 break_location=assignment.get("break_location") or assignment.get("location"),
                 teacher_name=teacher_name or None,
                 teacher_email=teacher_email or None,
-                created_at=datetime.utcnow(),
             )
             records.append(record)
     with session_factory() as session:
@@ -743,25 +760,10 @@ def covers_assignments():
     reassign_status = request.args.get("reassign_status")
     reassign_reason = request.args.get("reassign_reason")
 
-    date_options: list[dict[str, str | None]] = []
-    for date_key in date_keys:
-        label: str | None = None
-        try:
-            code = WEEKDAY_TO_DAY_CODE.get(datetime.fromisoformat(date_key).weekday())
-            if code:
-                label = DAY_LABELS.get(code, code)
-        except ValueError:
-            pass
-        date_options.append({"key": date_key, "label": label})
-
-    selected_day_label: str | None = None
-    if selected_date:
-        try:
-            code = WEEKDAY_TO_DAY_CODE.get(datetime.fromisoformat(selected_date).weekday())
-            if code:
-                selected_day_label = DAY_LABELS.get(code, code)
-        except ValueError:
-            selected_day_label = None
+    date_options: list[dict[str, str | None]] = [
+        {"key": date_key, "label": _day_label_for_date_key(date_key)} for date_key in date_keys
+    ]
+    selected_day_label = _day_label_for_date_key(selected_date) if selected_date else None
 
     return render_template(
         "covers_assignments.html",
@@ -776,18 +778,9 @@ def covers_assignments():
 
 @app.route("/assignments/settings", methods=["GET", "POST"])
 def assignment_settings():
-    field_names = [
-        "max_covers_default",
-        "max_covers_high",
-        "max_covers_high_friday",
-        "max_covers_middle",
-        "max_covers_middle_friday",
-        "highschool_full_threshold",
-        "middleschool_full_threshold",
-    ]
     if request.method == "POST":
         updates: dict[str, int] = {}
-        for field in field_names:
+        for field in ASSIGNMENT_SETTING_FIELDS:
             value = request.form.get(field)
             if not value:
                 continue
@@ -826,8 +819,8 @@ def _build_leaderboard_entries() -> list[dict[str, Any]]:
             if not name:
                 continue
             key = slug or name
-            meta = manager.get_teacher(slug) if slug else None
             if key not in stats:
+                meta = manager.get_teacher(slug) if slug else None
                 subject = meta.get("subject") if meta else entry.get("cover_subject") or "General"
                 level_label = meta.get("level_label") if meta else "General"
                 grade_levels = meta.get("grade_levels") if meta else []
@@ -976,13 +969,12 @@ def testing_assignments():
 
 @app.route("/absences")
 def absences_overview():
-    records_by_date = covers_manager.get_all_records()
-    date_keys = sorted(records_by_date.keys())
+    date_keys = covers_manager.record_dates()
     requested_date = request.args.get("date")
-    selected_date = requested_date if requested_date in records_by_date else None
+    selected_date = requested_date if requested_date in date_keys else None
     if not selected_date and date_keys:
         selected_date = date_keys[-1]
-    rows = records_by_date.get(selected_date, [])
+    rows = covers_manager.get_records_for_start_date(selected_date) if selected_date else []
 
     sync_status = request.args.get("sync_status")
     sync_added = _to_int(request.args.get("sync_added"))
@@ -997,25 +989,10 @@ def absences_overview():
     assigned_count = sum(1 for entry in rows if entry.get("request_id") in assigned_ids)
     pending_count = len(rows) - assigned_count
 
-    date_options: list[dict[str, str | None]] = []
-    for date_key in date_keys:
-        label: str | None = None
-        try:
-            code = WEEKDAY_TO_DAY_CODE.get(datetime.fromisoformat(date_key).weekday())
-            if code:
-                label = DAY_LABELS.get(code, code)
-        except ValueError:
-            pass
-        date_options.append({"key": date_key, "label": label})
-
-    selected_day_label: str | None = None
-    if selected_date:
-        try:
-            code = WEEKDAY_TO_DAY_CODE.get(datetime.fromisoformat(selected_date).weekday())
-            if code:
-                selected_day_label = DAY_LABELS.get(code, code)
-        except ValueError:
-            selected_day_label = None
+    date_options: list[dict[str, str | None]] = [
+        {"key": date_key, "label": _day_label_for_date_key(date_key)} for date_key in date_keys
+    ]
+    selected_day_label = _day_label_for_date_key(selected_date) if selected_date else None
 
     return render_template(
         "absences.html",
@@ -1262,8 +1239,35 @@ def trigger_deploy():
 
 @app.route("/print/all")
 def print_all():
-    schedules = manager.all_teacher_schedules()
-    return render_template("print_all.html", schedules=schedules)
+    return stream_template("print_all.html", schedules=manager.iter_teacher_schedules())
+
+
+@app.cli.command("prune-duty-assignments")
+@click.option("--older-than-days", default=180, show_default=True, type=int)
+def prune_duty_assignments(older_than_days: int) -> None:
+    cutoff = date.today() - timedelta(days=max(0, older_than_days))
+    with session_factory() as session:
+        duty_removed = (
+            session.query(DutyAssignment)
+            .filter(DutyAssignment.assignment_date < cutoff)
+            .delete(synchronize_session=False)
+        )
+        pod_removed = (
+            session.query(PodDutyAssignment)
+            .filter(PodDutyAssignment.assignment_date < cutoff)
+            .delete(synchronize_session=False)
+        )
+        session.commit()
+    click.echo(
+        f"Removed {duty_removed} duty and {pod_removed} pod duty assignments before {cutoff.isoformat()}"
+    )
+
+
+@app.cli.command("forward-pending-leaves")
+@click.option("--min-age-minutes", default=10, show_default=True, type=int)
+def forward_pending_leaves(min_age_minutes: int) -> None:
+    outcomes = covers_manager.forward_pending_records(timedelta(minutes=max(0, min_age_minutes)))
+    click.echo(f"Forwarded {outcomes['sent']} pending leaves; {outcomes['failed']} failed")
 
 
 if __name__ == "__main__":
@@ -4,10 +4,12 @@ from sqlalchemy import (
     Column,
     Date,
     DateTime,
+    Index,
     Integer,
     String,
     Text,
     UniqueConstraint,
+    func,
 )
 
 from db import Base
@@ -17,7 +19,7 @@ class ScheduleEntry(Base):
     __tablename__ = "schedule_entries"
 
     id = Column(Integer, primary_key=True)
-    teacher = Column(String, index=True, nullable=False)
+    teacher = Column(String, nullable=False)
     day = Column(String, nullable=False)
     day_code = Column(String, index=True, nullable=False)
     period = Column(String, nullable=False)
@@ -31,6 +33,10 @@ class ScheduleEntry(Base):
     subject = Column(String)
     course_count = Column(Integer)
 
+    __table_args__ = (
+        Index("ix_schedule_entries_teacher_day_rank", "teacher", "day_code", "period_rank"),
+    )
+
 
 class TeacherManifest(Base):
     __tablename__ = "teacher_manifest"
@@ -50,7 +56,7 @@ class AbsenceRecord(Base):
     teacher_email = Column(String, index=True, nullable=False)
     teacher_slug = Column(String)
     leave_type = Column(String)
-    leave_start = Column(Date, index=True, nullable=False)
+    leave_start = Column(Date, nullable=False)
     leave_end = Column(Date, nullable=False)
     status = Column(String)
     reason = Column(Text)
@@ -63,6 +69,10 @@ class AbsenceRecord(Base):
     forward_status = Column(String)
     forward_response = Column(Text)
 
+    __table_args__ = (
+        Index("ix_absence_records_leave_range", "leave_start", "leave_end"),
+    )
+
 
 class CoverAssignment(Base):
     __tablename__ = "cover_assignments"
@@ -118,7 +128,7 @@ class DutyAssignment(Base):
     __tablename__ = "duty_assignments"
 
     id = Column(Integer, primary_key=True)
-    assignment_date = Column(Date, index=True, nullable=False)
+    assignment_date = Column(Date, nullable=False)
     grade = Column(String, index=True)
     slot_type = Column(String, nullable=False)
     period_label = Column(String)
@@ -127,21 +137,29 @@ class DutyAssignment(Base):
     break_location = Column(String)
     teacher_name = Column(String)
     teacher_email = Column(String, index=True)
-    created_at = Column(DateTime)
+    created_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_duty_assignments_date_slot_period", "assignment_date", "slot_type", "period_label"),
+    )
 
 
 class PodDutyAssignment(Base):
     __tablename__ = "pod_duty_assignments"
 
     id = Column(Integer, primary_key=True)
-    assignment_date = Column(Date, index=True, nullable=False)
+    assignment_date = Column(Date, nullable=False)
     day_code = Column(String, index=True)
     period_label = Column(String, index=True)
     pod_label = Column(String, index=True)
     teacher_name = Column(String)
     teacher_email = Column(String)
     teacher_slug = Column(String, index=True)
-    created_at = Column(DateTime)
+    created_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_pod_duty_date_period", "assignment_date", "period_label"),
+    )
 
 
 class PodDutyNotification(Base):
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
-from datetime import date, datetime
+from collections import OrderedDict
+from datetime import date
 from typing import Any, Callable, Iterable
 
 from models import PodDutyAssignment
 from schedule_service import WEEKDAY_TO_DAY_CODE
 
 POD_GRADES = (6, 6, 7, 7, 10, 10, 11, 11, 12, 12)
+MAX_CACHED_ASSIGNMENT_SLOTS = 256
 
 
 class PodDutyManager:
@@ -21,7 +23,7 @@ class PodDutyManager:
         self._session_factory = session_factory
         self.covers_manager = covers_manager
         self._excluded_slugs_source = excluded_slugs_source
-        self._cached_assignments: dict[tuple[str, str], list[dict[str, Any]]] = {}
+        self._cached_assignments: OrderedDict[tuple[str, str], list[dict[str, Any]]] = OrderedDict()
         self._pods = self._build_pods()
         self.refresh_dynamic_rows()
 
@@ -138,10 +140,9 @@ class PodDutyManager:
         day_code = self._day_code_for_date(parsed)
         if not day_code:
             return []
-        payload = self.schedule_manager.available_for_slot_api(
+        return self.schedule_manager.teachers_available_for_api(
             day_code, period, assignment_date=parsed
         )
-        return payload.get("available", [])
 
     def allowed_slugs_by_pod(
         self,
@@ -172,7 +173,7 @@ class PodDutyManager:
     def _absent_slugs(self, assignment_date: date | None) -> set[str]:
         if not assignment_date or not self.covers_manager:
             return set()
-        records = self.covers_manager.get_absences_for_date(assignment_date.isoformat())
+        records = self.covers_manager.absent_teachers_for_date(assignment_date.isoformat())
         slugs = {
             record.get("teacher_slug")
             for record in records
@@ -192,6 +193,9 @@ class PodDutyManager:
             return
         key = self._assignment_key(parsed, period)
         self._cached_assignments[key] = [assignment.copy() for assignment in assignments]
+        self._cached_assignments.move_to_end(key)
+        while len(self._cached_assignments) > MAX_CACHED_ASSIGNMENT_SLOTS:
+            self._cached_assignments.popitem(last=False)
 
     def get_cached_assignments(
         self,
@@ -234,7 +238,6 @@ class PodDutyManager:
             teacher_name=meta.get("name"),
             teacher_email=meta.get("email"),
             teacher_slug=slug,
-            created_at=datetime.utcnow(),
         )
 
     def _replace_assignments(
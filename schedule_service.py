@@ -1,9 +1,11 @@
 from __future__ import annotations
 import re
 from datetime import date, datetime
-from typing import Any, Callable
+from functools import lru_cache
+from typing import Any, Callable, Iterator
 
 import pandas as pd
+from sqlalchemy import insert
 
 from models import DutyAssignment, ScheduleEntry, TeacherManifest
 
@@ -19,6 +21,8 @@ DAY_INDEX = {code: idx for idx, code in enumerate(DAY_ORDER)}
 WEEKDAY_TO_DAY_CODE = {idx: code for idx, code in enumerate(DAY_ORDER)}
 DAY_LABEL_TO_CODE = {label: code for code, label in DAY_LABELS.items()}
 NON_CLASS_DETAILS = {"homeroom"}
+MIDDLE_SCHOOL_GRADES = frozenset({6, 7})
+HIGH_SCHOOL_GRADES = frozenset({10, 11, 12})
 
 PERIOD_CANONICAL = {
     "Homeroom 7:30 - 7:45": "Homeroom",
@@ -39,6 +43,8 @@ PERIOD_CANONICAL = {
     "P7 1:55 - 2:45": "P7",
 }
 
+PERIOD_CANONICAL_LOWER = {alias.lower(): canonical for alias, canonical in PERIOD_CANONICAL.items()}
+
 ORDERED_PERIODS = [
     "Homeroom",
     "P1",
@@ -49,15 +55,46 @@ ORDERED_PERIODS = [
     "P6",
     "P7",
 ]
+PERIOD_RANK = {period: rank for rank, period in enumerate(ORDERED_PERIODS)}
 
 GRADE_PATTERN = re.compile(r"(?:G)?(6|7|10|11|12)")
+CONTACT_NAME_PATTERN = re.compile(r'"([^"]+)"')
+CONTACT_EMAIL_PATTERN = re.compile(r"<([^>]+)>")
+SLUG_PATTERN = re.compile(r"[^a-z0-9]+")
+SCHEDULE_FRAME_COLUMNS = {
+    "Teacher": ScheduleEntry.teacher,
+    "Day": ScheduleEntry.day,
+    "DayCode": ScheduleEntry.day_code,
+    "Period": ScheduleEntry.period,
+    "PeriodRaw": ScheduleEntry.period_raw,
+    "PeriodGroup": ScheduleEntry.period_group,
+    "PeriodRank": ScheduleEntry.period_rank,
+    "GradeDetected": ScheduleEntry.grade_detected,
+    "Details": ScheduleEntry.details,
+    "DetailsDisplay": ScheduleEntry.details_display,
+    "email": ScheduleEntry.email,
+    "subject": ScheduleEntry.subject,
+    "course_count": ScheduleEntry.course_count,
+}
 
 
+@lru_cache(maxsize=1024)
 def slugify(text: str) -> str:
-    slug = re.sub(r"[^a-z0-9]+", "-", text.lower())
+    slug = SLUG_PATTERN.sub("-", text.lower())
     return slug.strip("-")
 
 
+@lru_cache(maxsize=2048)
+def detect_grade(details: str) -> int | None:
+    match = GRADE_PATTERN.search(details)
+    if not match:
+        return None
+    try:
+        return int(match.group(1))
+    except ValueError:
+        return None
+
+
 class ScheduleManager:
     def __init__(self, excel_path: str, session_factory: Callable | None = None):
         self.excel_path = excel_path
@@ -71,6 +108,7 @@ class ScheduleManager:
         self._course_count_column = self._select_course_count_column()
         self._manifest = self._load_teacher_manifest()
         self._teachers = self._build_teacher_index()
+        self._teacher_cards = self._build_teacher_cards()
         self._name_index = self._build_name_index()
         self._email_index = self._build_email_index()
 
@@ -82,6 +120,7 @@ class ScheduleManager:
         self._course_count_column = self._select_course_count_column()
         self._manifest = self._load_teacher_manifest()
         self._teachers = self._build_teacher_index()
+        self._teacher_cards = self._build_teacher_cards()
         self._name_index = self._build_name_index()
         self._email_index = self._build_email_index()
 
@@ -118,6 +157,15 @@ class ScheduleManager:
         with self._session_factory() as session:
             rows = (
                 session.query(ScheduleEntry)
+                .with_entities(
+                    ScheduleEntry.id,
+                    ScheduleEntry.day_code,
+                    ScheduleEntry.day,
+                    ScheduleEntry.period,
+                    ScheduleEntry.period_raw,
+                    ScheduleEntry.details,
+                    ScheduleEntry.subject,
+                )
                 .filter(ScheduleEntry.teacher == meta["name"])
                 .order_by(ScheduleEntry.day_code, ScheduleEntry.period_rank)
                 .all()
@@ -266,35 +314,24 @@ class ScheduleManager:
             frames.append(self._duty_rows)
         return pd.concat(frames, ignore_index=True)
 
-    def clear_cover_assignments(self) -> None:
-        self._cover_rows = pd.DataFrame(columns=self._df.columns)
-
-    def clear_pod_duty_assignments(self) -> None:
-        self._duty_rows = pd.DataFrame(columns=self._df.columns)
-
     def rebuild_cover_assignments(
         self, assignments: dict[str, list[dict[str, Any]]]
     ) -> None:
-        self.clear_cover_assignments()
-        for rows in assignments.values():
-            for entry in rows:
-                self._append_cover_row(entry)
-        if not self._cover_rows.empty:
-            self._cover_rows = self._cover_rows.reset_index(drop=True)
+        rows = [self._cover_row(entry) for entries in assignments.values() for entry in entries]
+        self._cover_rows = self._rows_frame(rows)
 
     def rebuild_pod_duty_assignments(self, assignments: list[dict[str, Any]]) -> None:
-        self.clear_pod_duty_assignments()
-        for entry in assignments:
-            self._append_pod_duty_row(entry)
-        if not self._duty_rows.empty:
-            self._duty_rows = self._duty_rows.reset_index(drop=True)
+        self._duty_rows = self._rows_frame([self._pod_duty_row(entry) for entry in assignments])
 
-    def _append_cover_row(self, assignment: dict[str, Any]) -> None:
+    def _rows_frame(self, rows: list[dict[str, Any] | None]) -> pd.DataFrame:
+        return pd.DataFrame([row for row in rows if row], columns=self._df.columns, dtype=object)
+
+    def _cover_row(self, assignment: dict[str, Any]) -> dict[str, Any] | None:
         if not assignment:
-            return
+            return None
         teacher_name = assignment.get("cover_teacher")
         if not teacher_name:
-            return
+            return None
         day_code = self._day_code_for_assignment(assignment)
         period_label = str(assignment.get("period_label") or assignment.get("period_raw") or "Cover").strip()
         period_raw = str(assignment.get("period_raw") or assignment.get("period_label") or period_label).strip()
@@ -310,7 +347,7 @@ class ScheduleManager:
         day_label = DAY_LABELS.get(day_code) if day_code else assignment.get("day_label") or "Cover"
         class_subject = assignment.get("class_subject")
         subject_value = class_subject or (teacher_meta.get("subject") if teacher_meta else None) or "General"
-        row = {
+        return {
             "Teacher": teacher_name,
             "Day": day_label,
             "Period": period_label,
@@ -325,17 +362,13 @@ class ScheduleManager:
             "GradeDetected": grade_detected,
             "DetailsDisplay": details,
         }
-        self._cover_rows = pd.concat(
-            [self._cover_rows, pd.DataFrame([row])],
-            ignore_index=True,
-        )
 
-    def _append_pod_duty_row(self, assignment: dict[str, Any]) -> None:
+    def _pod_duty_row(self, assignment: dict[str, Any]) -> dict[str, Any] | None:
         if not assignment:
-            return
+            return None
         teacher_name = assignment.get("teacher_name") or assignment.get("teacher")
         if not teacher_name:
-            return
+            return None
         day_code = assignment.get("day_code")
         if not day_code:
             date_value = assignment.get("assignment_date") or assignment.get("date")
@@ -347,14 +380,14 @@ class ScheduleManager:
                     day_code = None
         period_label = str(assignment.get("period_label") or "").strip()
         if not period_label:
-            return
+            return None
         period_raw = str(assignment.get("period_raw") or period_label).strip()
         period_group = self._normalize_period(period_raw) or period_label
         period_rank = self._period_rank(period_group or period_raw) or len(ORDERED_PERIODS)
         pod_label = assignment.get("pod_label") or assignment.get("pod") or ""
         details = assignment.get("details") or f"Pod Duty {pod_label}".strip() or "Pod Duty"
         email = assignment.get("teacher_email") or assignment.get("email")
-        row = {
+        return {
             "Teacher": teacher_name,
             "Day": DAY_LABELS.get(day_code, day_code or ""),
             "Period": period_label,
@@ -369,10 +402,6 @@ class ScheduleManager:
             "GradeDetected": None,
             "DetailsDisplay": details,
         }
-        self._duty_rows = pd.concat(
-            [self._duty_rows, pd.DataFrame([row])],
-            ignore_index=True,
-        )
 
     def _day_code_for_assignment(self, assignment: dict[str, Any]) -> str | None:
         label = assignment.get("day_label")
@@ -394,44 +423,12 @@ class ScheduleManager:
         if not self._session_factory:
             return self._load_schedule_from_excel()
         with self._session_factory() as session:
-            rows = session.query(ScheduleEntry).all()
-        if not rows:
-            return pd.DataFrame(
-                columns=[
-                    "Teacher",
-                    "Day",
-                    "DayCode",
-                    "Period",
-                    "PeriodRaw",
-                    "PeriodGroup",
-                    "PeriodRank",
-                    "GradeDetected",
-                    "Details",
-                    "DetailsDisplay",
-                    "email",
-                    "subject",
-                    "course_count",
-                ]
+            rows = (
+                session.query(ScheduleEntry)
+                .with_entities(*SCHEDULE_FRAME_COLUMNS.values())
+                .all()
             )
-        data = [
-            {
-                "Teacher": row.teacher,
-                "Day": row.day,
-                "DayCode": row.day_code,
-                "Period": row.period,
-                "PeriodRaw": row.period_raw,
-                "PeriodGroup": row.period_group,
-                "PeriodRank": row.period_rank,
-                "GradeDetected": row.grade_detected,
-                "Details": row.details,
-                "DetailsDisplay": row.details_display,
-                "email": row.email,
-                "subject": row.subject,
-                "course_count": row.course_count,
-            }
-            for row in rows
-        ]
-        return pd.DataFrame(data)
+        return pd.DataFrame.from_records(rows, columns=list(SCHEDULE_FRAME_COLUMNS))
 
     def _load_schedule_from_excel(self) -> pd.DataFrame:
         df = pd.read_excel(self.excel_path)
@@ -450,40 +447,40 @@ class ScheduleManager:
             return 0
         df = self._load_schedule_from_excel()
         manifest = self._load_teacher_manifest_from_excel()
-        entries = []
-        for _, row in df.iterrows():
-            entries.append(
-                ScheduleEntry(
-                    teacher=str(row.get("Teacher") or "").strip(),
-                    day=str(row.get("Day") or "").strip(),
-                    day_code=str(row.get("DayCode") or "").strip(),
-                    period=str(row.get("Period") or "").strip(),
-                    period_raw=str(row.get("PeriodRaw") or "").strip(),
-                    period_group=str(row.get("PeriodGroup") or "").strip(),
-                    period_rank=self._as_int(row.get("PeriodRank")),
-                    grade_detected=self._as_int(row.get("GradeDetected")),
-                    details=str(row.get("Details") or "").strip(),
-                    details_display=str(row.get("DetailsDisplay") or "").strip(),
-                    email=str(row.get("email") or "").strip(),
-                    subject=str(row.get("subject") or "").strip(),
-                    course_count=self._as_int(row.get("course_count")),
-                )
-            )
+        entries = [
+            {
+                "teacher": str(row.get("Teacher") or "").strip(),
+                "day": str(row.get("Day") or "").strip(),
+                "day_code": str(row.get("DayCode") or "").strip(),
+                "period": str(row.get("Period") or "").strip(),
+                "period_raw": str(row.get("PeriodRaw") or "").strip(),
+                "period_group": str(row.get("PeriodGroup") or "").strip(),
+                "period_rank": self._as_int(row.get("PeriodRank")),
+                "grade_detected": self._as_int(row.get("GradeDetected")),
+                "details": str(row.get("Details") or "").strip(),
+                "details_display": str(row.get("DetailsDisplay") or "").strip(),
+                "email": str(row.get("email") or "").strip(),
+                "subject": str(row.get("subject") or "").strip(),
+                "course_count": self._as_int(row.get("course_count")),
+            }
+            for row in df.to_dict("records")
+        ]
         with self._session_factory() as session:
             session.query(ScheduleEntry).delete()
             session.query(TeacherManifest).delete()
             if entries:
-                session.bulk_save_objects(entries)
+                session.execute(insert(ScheduleEntry), entries)
             if manifest:
-                session.bulk_save_objects(
+                session.execute(
+                    insert(TeacherManifest),
                     [
-                        TeacherManifest(
-                            slug=slug,
-                            name=data.get("name") or slug,
-                            email=data.get("email"),
-                        )
+                        {
+                            "slug": slug,
+                            "name": data.get("name") or slug,
+                            "email": data.get("email"),
+                        }
                         for slug, data in manifest.items()
-                    ]
+                    ],
                 )
             session.commit()
         return len(entries)
@@ -502,9 +499,9 @@ class ScheduleManager:
         if normalized:
             return normalized
         lowered = period.lower()
-        for alias, canonical in PERIOD_CANONICAL.items():
-            if alias.lower() == lowered:
-                return canonical
+        normalized = PERIOD_CANONICAL_LOWER.get(lowered)
+        if normalized:
+            return normalized
         if lowered.startswith("p"):
             digit = ""
             for char in lowered[1:]:
@@ -517,19 +514,10 @@ class ScheduleManager:
         return period
 
     def _period_rank(self, period: str) -> int | None:
-        try:
-            return ORDERED_PERIODS.index(period)
-        except ValueError:
-            return None
+        return PERIOD_RANK.get(period)
 
     def _detect_grade(self, details: str) -> int | None:
-        match = GRADE_PATTERN.search(details)
-        if not match:
-            return None
-        try:
-            return int(match.group(1))
-        except ValueError:
-            return None
+        return detect_grade(details)
 
     def _build_teacher_index(self) -> dict[str, dict]:
         teachers = {}
@@ -604,17 +592,15 @@ class ScheduleManager:
     def _grade_label(self, grade_levels: list[int]) -> str:
         if not grade_levels:
             return "General"
-        middle = {6, 7}
-        high = {10, 11, 12}
         unique_grades = set(grade_levels)
-        has_middle = bool(unique_grades & middle)
-        has_high = bool(unique_grades & high)
+        has_middle = bool(unique_grades & MIDDLE_SCHOOL_GRADES)
+        has_high = bool(unique_grades & HIGH_SCHOOL_GRADES)
         if has_middle and has_high:
             return "Middle & High School"
         primary_grade = grade_levels[0]
-        if primary_grade in middle:
+        if primary_grade in MIDDLE_SCHOOL_GRADES:
             return "Middle School"
-        if primary_grade in high:
+        if primary_grade in HIGH_SCHOOL_GRADES:
             return "High School"
         if has_high:
             return "High School"
@@ -744,16 +730,16 @@ class ScheduleManager:
         if raw_contact is None or (isinstance(raw_contact, float) and pd.isna(raw_contact)):
             return None, None
         text = str(raw_contact)
-        name_match = re.search(r'"([^"]+)"', text)
-        email_match = re.search(r"<([^>]+)>", text)
+        name_match = CONTACT_NAME_PATTERN.search(text)
+        email_match = CONTACT_EMAIL_PATTERN.search(text)
         return (name_match.group(1) if name_match else None, email_match.group(1) if email_match else None)
 
+    def _build_teacher_cards(self) -> list[dict]:
+        return sorted(self._teachers.values(), key=lambda card: card["name"])
+
     @property
     def teacher_cards(self) -> list[dict]:
-        cards = []
-        for meta in self._teachers.values():
-            cards.append(meta)
-        return sorted(cards, key=lambda card: card["name"])
+        return list(self._teacher_cards)
 
     @property
     def teacher_count(self) -> int:
@@ -785,32 +771,28 @@ class ScheduleManager:
             return None
         source_df = self._combined_schedule_df() if include_covers else self._df
         schedule_df = source_df[source_df["Teacher"] == meta["name"]]
-        schedule_by_day = []
-        for day_code in DAY_ORDER:
-            day_name = DAY_LABELS.get(day_code, day_code)
-            day_rows = schedule_df[schedule_df["DayCode"] == day_code]
-            max_periods = self._max_periods_for_level(meta["level_label"], day_code)
-            scheduled_count = len(day_rows[day_rows["PeriodGroup"] != "Homeroom"])
-            day_sections = self._group_periods(day_rows)
-            schedule_by_day.append(
-                {
-                    "code": day_code,
-                    "label": day_name,
-                    "sections": day_sections,
-                    "scheduled_count": scheduled_count,
-                    "max_periods": max_periods,
-                    "free_periods": max(0, max_periods - scheduled_count),
-                }
-            )
+        schedule_by_day = [self._day_schedule(meta, schedule_df, day_code) for day_code in DAY_ORDER]
         return {"meta": meta, "schedule": schedule_by_day}
 
+    def _day_schedule(self, meta: dict, schedule_df: pd.DataFrame, day_code: str) -> dict:
+        day_rows = schedule_df[schedule_df["DayCode"] == day_code]
+        max_periods = self._max_periods_for_level(meta["level_label"], day_code)
+        scheduled_count = len(day_rows[day_rows["PeriodGroup"] != "Homeroom"])
+        return {
+            "code": day_code,
+            "label": DAY_LABELS.get(day_code, day_code),
+            "sections": self._group_periods(day_rows),
+            "scheduled_count": scheduled_count,
+            "max_periods": max_periods,
+            "free_periods": max(0, max_periods - scheduled_count),
+        }
+
     def day_summary_for_teacher(self, slug: str, day_code: str) -> dict:
-        data = self.get_schedule_for_teacher(slug, include_covers=True)
-        if data:
-            for day in data["schedule"]:
-                if day.get("code") == day_code:
-                    return day
         meta = self.get_teacher(slug)
+        if meta and day_code in DAY_INDEX:
+            source_df = self._combined_schedule_df()
+            schedule_df = source_df[source_df["Teacher"] == meta["name"]]
+            return self._day_schedule(meta, schedule_df, day_code)
         level_label = meta["level_label"] if meta else "General"
         max_periods = self._max_periods_for_level(level_label, day_code)
         return {
@@ -823,12 +805,13 @@ class ScheduleManager:
         }
 
     def all_teacher_schedules(self) -> list[dict]:
-        schedules = []
+        return list(self.iter_teacher_schedules())
+
+    def iter_teacher_schedules(self) -> Iterator[dict]:
         for slug in sorted(self._teachers.keys(), key=lambda slug: self._teachers[slug]["name"]):
             schedule = self.get_schedule_for_teacher(slug)
             if schedule:
-                schedules.append(schedule)
-        return schedules
+                yield schedule
 
     def _group_periods(self, day_rows: pd.DataFrame) -> list[dict]:
         sections = []
@@ -844,17 +827,23 @@ class ScheduleManager:
 
     def _section_for_bucket(self, label: str, bucket: pd.DataFrame) -> dict:
         times = sorted(bucket["PeriodRaw"].unique())
+        ordered = bucket.sort_values("PeriodRank")
         return {
             "period": label,
             "time": ", ".join(times),
             "details": [
                 {
-                    "details": row["DetailsDisplay"],
-                    "subject": row["subject"],
-                    "grade": f"G{row['GradeDetected']}" if row["GradeDetected"] else "G - N/A",
-                    "period_raw": row["PeriodRaw"],
+                    "details": details,
+                    "subject": subject,
+                    "grade": f"G{grade}" if grade else "G - N/A",
+                    "period_raw": period_raw,
                 }
-                for _, row in bucket.sort_values("PeriodRank").iterrows()
+                for details, subject, grade, period_raw in zip(
+                    ordered["DetailsDisplay"],
+                    ordered["subject"],
+                    ordered["GradeDetected"],
+                    ordered["PeriodRaw"],
+                )
             ],
         }
 
@@ -938,17 +927,22 @@ class ScheduleManager:
         ]
         result = {}
         seen_keys: set[str] = set()
-        for _, row in scheduled.iterrows():
-            result[row["Teacher"]] = {
-                "name": row["Teacher"],
-                "period": row["PeriodGroup"],
-                "details": row["DetailsDisplay"],
-                "subject": row["subject"],
+        for teacher, period, details, subject in zip(
+            scheduled["Teacher"],
+            scheduled["PeriodGroup"],
+            scheduled["DetailsDisplay"],
+            scheduled["subject"],
+        ):
+            result[teacher] = {
+                "name": teacher,
+                "period": period,
+                "details": details,
+                "subject": subject,
             }
-            name_key = row["Teacher"].strip().lower()
+            name_key = teacher.strip().lower()
             if name_key:
                 seen_keys.add(name_key)
-            meta = self._name_index.get(row["Teacher"])
+            meta = self._name_index.get(teacher)
             if meta and meta.get("email"):
                 seen_keys.add(meta["email"].strip().lower())
         enriched = []
@@ -1080,11 +1074,15 @@ class ScheduleManager:
         current = self._combined_schedule_df()
         day_rows = current[current["DayCode"] == day_code]
         scheduled: dict[str, set[str]] = {}
-        for _, row in day_rows.iterrows():
-            teacher = row.get("Teacher")
+        for teacher, period_group, period_raw, period_label in zip(
+            day_rows["Teacher"],
+            day_rows["PeriodGroup"],
+            day_rows["PeriodRaw"],
+            day_rows["Period"],
+        ):
             if not teacher:
                 continue
-            period = row.get("PeriodGroup") or row.get("PeriodRaw") or row.get("Period")
+            period = period_group or period_raw or period_label
             if not period:
                 continue
             scheduled.setdefault(teacher, set()).add(str(period))